@@ -4,24 +4,87 @@ Batch-process Excel questions via Feedcoop agent API.
 """
 
 import argparse
-import json
+import asyncio
+import io
+import os
+import random
+import sqlite3
 import sys
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Tuple
-
+from typing import (
+    Any,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import httpx
+import orjson
 import requests
-from openpyxl import load_workbook
-from openpyxl.utils import column_index_from_string, get_column_letter  # noqa: F401
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.worksheet.dimensions import ColumnDimension
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse
+
+from sse_stream import SSEStreamError, aiter_sse_deltas, iter_sse_deltas, read_blocks
+
+try:
+    import uvloop  # Optional libuv-based event loop; not available on Windows
+except ImportError:  # pragma: no cover - depends on the platform
+    uvloop = None
 
 HOST = "open.feedcoopapi.com"  # Base host for the agent API
 PATH = "/agent_api/agent/chat/completion"  # Endpoint for chat completions
 CONTENT_TYPE = "application/json"  # Shared content-type header for POST bodies
+URL = f"https://{HOST}{PATH}"
+CHECKPOINT_SUFFIX = ".jsonl"  # Progress file kept next to the output workbook
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+FATAL_STATUSES = frozenset({401, 403})  # Bad credentials: abort the whole run
+RETRY_BACKOFF_CAP = 60.0  # Upper bound (seconds) for the exponential backoff
+RETRY_JITTER = 1.0  # Random extra wait (seconds) added to every backoff
 
 
 class AgentAPIError(RuntimeError):
     """Raised when the agent API response is invalid."""
 
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status = status  # HTTP status, when the failure came from one
+        self.retry_after = retry_after  # Server-requested wait in seconds
+
+
+class TransientAgentError(AgentAPIError):
+    """Throttling or server-side failure (429/5xx); the row is worth retrying."""
+
+
+class PermanentAgentError(AgentAPIError):
+    """
+    Authentication/authorization failure (401/403). Every other row would fail
+    the same way, so the whole batch is aborted instead of retried.
+    """
+
 
 class AgentClient:
     """
@@ -33,7 +96,22 @@ class AgentClient:
         self.bot_id = bot_id
         self.api_key = api_key
         self.timeout = timeout
+        # Constant for the client's lifetime: attached to each session once
+        # instead of being rebuilt for every request
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": CONTENT_TYPE,
+            "Accept": "text/event-stream",
+        }
         self.session = requests.Session()  # Reuse TCP connections across rows
+        self.session.headers.update(self.headers)
+        # The body skeleton is identical for every row, so serialize it once
+        # around a unique placeholder and splice each encoded question in
+        placeholder = f"question-{uuid.uuid4().hex}"
+        template = orjson.dumps(self._body(placeholder))
+        self._body_prefix, self._body_suffix = template.split(
+            orjson.dumps(placeholder)
+        )
 
     def complete(
         self, question: str, temperature: Optional[float] = None
@@ -42,8 +120,52 @@ class AgentClient:
         Send one question to the agent and return (answer, 首帧耗时秒).
         首帧耗时为请求发起到收到第一段内容之间的时间，若未观测到内容则为 None。
         """
+        return self._post(self._encode_body(question, temperature))
+
+    async def complete_async(
+        self,
+        session: httpx.AsyncClient,
+        question: str,
+        temperature: Optional[float] = None,
+    ) -> Tuple[str, Optional[float]]:
+        """
+        Async counterpart of `complete`, sharing the caller's HTTP/2 client so
+        many rows can stream concurrently over a few multiplexed connections.
+        """
+        body = self._encode_body(question, temperature)
+        return await self._post_async(session, body)
+
+    def new_async_session(self, concurrency: int) -> httpx.AsyncClient:
+        """
+        Create the shared async client for a batch run. HTTP/2 multiplexes all
+        concurrent streams over one TLS connection where the server supports
+        it; the pool limits still cap sockets when it falls back to HTTP/1.1.
+        """
+        limits = httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency,
+            keepalive_expiry=60,
+        )
+        # Per-phase (connect/read/...) timeouts rather than a total deadline,
+        # since long answers may legitimately stream for a while
+        return httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(self.timeout),
+            limits=limits,
+            headers=self.headers,
+        )
+
+    def _encode_body(self, question: str, temperature: Optional[float]) -> bytes:
+        """Serialize the streaming chat-completion request body for one question."""
         if not question:
             raise ValueError("问题内容为空")
+        if temperature is None:
+            # Common path: only the question itself needs encoding per row
+            return self._body_prefix + orjson.dumps(question) + self._body_suffix
+        return orjson.dumps(self._body(question, temperature))
+
+    def _body(self, question: str, temperature: Optional[float] = None) -> dict:
+        """Assemble the request body as a dict."""
         body = {
             "bot_id": self.bot_id,
             "messages": [{"role": "user", "content": question}],
@@ -51,61 +173,433 @@ class AgentClient:
         }
         if temperature is not None:
             body["temperature"] = temperature
-        return self._post(body)
+        return body
 
-    def _post(self, body: dict) -> Tuple[str, Optional[float]]:
+    def _post(self, body: bytes) -> Tuple[str, Optional[float]]:
         """
         Perform the streaming POST request, stitch together all chunks, and
         measure the first-token latency (seconds).
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": CONTENT_TYPE,
-        }
-        url = f"https://{HOST}{PATH}"
         start_time = time.perf_counter()
         with self.session.post(
-            url, json=body, headers=headers, timeout=self.timeout, stream=True
+            URL,
+            data=body,
+            timeout=self.timeout,
+            stream=True,
         ) as resp:
             if resp.status_code != 200:
-                raise AgentAPIError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                raise _http_error(resp.status_code, resp.text, resp.headers)
 
-            chunks = []
+            answer = io.StringIO()  # Grows in place; no per-delta list entries
             first_chunk_time: Optional[float] = None
-            for line in resp.iter_lines():
-                if not line:
-                    continue
-                line_str = line.decode("utf-8", errors="ignore").strip()
-                # Non-streaming errors surface as plain text rather than SSE data
-                if "invalid_request" in line_str and not line_str.startswith("data:"):
-                    raise AgentAPIError(line_str)
-                if not line_str.startswith("data:"):
-                    continue
-
-                data = line_str[len("data:") :].strip()
-                if data in ("[DONE]", "done"):
-                    break
-                try:
-                    payload = json.loads(data)
-                except json.JSONDecodeError:
-                    continue  # Ignore malformed SSE payloads
-
-                delta = payload["choices"][0].get("delta", {})
-                content = delta.get("content")
-                if content:
+            try:
+                for content in iter_sse_deltas(read_blocks(resp.raw)):
                     if first_chunk_time is None:
                         first_chunk_time = time.perf_counter()
-                    chunks.append(content)
+                    answer.write(content)
+            except SSEStreamError as exc:
+                raise AgentAPIError(str(exc)) from exc
 
-            if not chunks:
+            if first_chunk_time is None:
                 raise AgentAPIError("未收到有效内容")
-            latency = (
-                first_chunk_time - start_time if first_chunk_time is not None else None
+            return answer.getvalue().strip(), first_chunk_time - start_time
+
+    async def _post_async(
+        self, session: httpx.AsyncClient, body: bytes
+    ) -> Tuple[str, Optional[float]]:
+        """
+        httpx version of `_post`: same SSE handling and latency measurement,
+        but awaits the stream so other rows progress while this one waits.
+        """
+        start_time = time.perf_counter()
+        async with session.stream("POST", URL, content=body) as resp:
+            if resp.status_code != 200:
+                text = (await resp.aread()).decode("utf-8", errors="ignore")
+                raise _http_error(resp.status_code, text, resp.headers)
+
+            answer = io.StringIO()  # Grows in place; no per-delta list entries
+            first_chunk_time: Optional[float] = None
+            try:
+                async for content in aiter_sse_deltas(resp.aiter_bytes()):
+                    if first_chunk_time is None:
+                        first_chunk_time = time.perf_counter()
+                    answer.write(content)
+            except SSEStreamError as exc:
+                raise AgentAPIError(str(exc)) from exc
+
+            if first_chunk_time is None:
+                raise AgentAPIError("未收到有效内容")
+            return answer.getvalue().strip(), first_chunk_time - start_time
+
+
+class AnswerCache:
+    """
+    Reuse answers for repeated questions. Duplicates within a run share one
+    in-flight request through a Future; with `db_path`, answers are also kept
+    in SQLite keyed on (bot_id, question, temperature) and survive across runs.
+    """
+
+    def __init__(
+        self, bot_id: str, temperature: Optional[float], db_path: Optional[Path]
+    ) -> None:
+        self.bot_id = bot_id
+        self.temperature = "" if temperature is None else repr(temperature)
+        self._pending: Dict[str, "asyncio.Future[Tuple[str, Optional[float]]]"] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, isolation_level=None)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "bot_id TEXT, question TEXT, temperature TEXT, answer TEXT, "
+                "latency REAL, PRIMARY KEY (bot_id, question, temperature))"
+            )
+
+    async def get_or_fetch(
+        self,
+        question: str,
+        fetch: Callable[[], Awaitable[Tuple[str, Optional[float]]]],
+    ) -> Tuple[Tuple[str, Optional[float]], bool]:
+        """
+        Return ((answer, latency), reused). Only the first caller for a question
+        runs `fetch`; a failure is shared with current waiters but not cached.
+        """
+        pending = self._pending.get(question)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        stored = self._load(question)
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Tuple[str, Optional[float]]]" = loop.create_future()
+        if stored is not None:
+            future.set_result(stored)
+            self._pending[question] = future
+            return stored, True
+
+        self._pending[question] = future
+        try:
+            result = await fetch()
+        except BaseException as exc:
+            del self._pending[question]  # Let a later duplicate try again
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                future.exception()  # Mark retrieved: there may be no waiters
+            raise
+        future.set_result(result)
+        self._store(question, result)
+        return result, False
+
+    def close(self) -> None:
+        """Close the SQLite connection, if any."""
+        if self._db is not None:
+            self._db.close()
+
+    def _load(self, question: str) -> Optional[Tuple[str, Optional[float]]]:
+        """Look up a persisted answer from an earlier run."""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT answer, latency FROM answers "
+            "WHERE bot_id = ? AND question = ? AND temperature = ?",
+            (self.bot_id, question, self.temperature),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _store(self, question: str, result: Tuple[str, Optional[float]]) -> None:
+        """Persist a fresh answer (autocommit, so it survives a crash)."""
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+            (self.bot_id, question, self.temperature, *result),
+        )
+
+
+async def complete_with_retries(
+    client: AgentClient,
+    session: httpx.AsyncClient,
+    row: int,
+    question_text: str,
+    temperature: Optional[float],
+    max_retries: int,
+    retry_wait: float,
+) -> Tuple[str, Optional[float]]:
+    """
+    Call the agent for one row, retrying transient failures with exponential
+    backoff plus jitter (or the server's Retry-After). Re-raises the last error.
+    """
+    attempt = 1
+    while True:
+        try:
+            return await client.complete_async(session, question_text, temperature)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(
+                f"[WARN] Row {row} attempt {attempt} failed: {exc}",
+                file=sys.stderr,
+            )
+            if attempt >= max_retries or not _is_retryable(exc):
+                raise
+            await asyncio.sleep(_backoff_delay(exc, attempt, retry_wait))
+            attempt += 1
+
+
+def _http_error(status: int, text: str, headers: Mapping[str, str]) -> AgentAPIError:
+    """Classify a non-200 response as fatal to the run, retryable, or row-only."""
+    if status in FATAL_STATUSES:
+        error_cls = PermanentAgentError
+    elif status in RETRYABLE_STATUSES:
+        error_cls = TransientAgentError
+    else:
+        error_cls = AgentAPIError
+    return error_cls(
+        f"HTTP {status}: {text[:200]}",
+        status=status,
+        retry_after=_parse_retry_after(headers.get("Retry-After")),
+    )
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Only throttling, server-side and transport failures are worth retrying."""
+    return isinstance(exc, (TransientAgentError, httpx.TransportError))
+
+
+def _backoff_delay(exc: Exception, attempt: int, retry_wait: float) -> float:
+    """Exponential backoff with jitter, never shorter than a Retry-After hint."""
+    delay = min(RETRY_BACKOFF_CAP, retry_wait * 2 ** (attempt - 1))
+    delay += random.uniform(0, RETRY_JITTER)  # De-synchronize concurrent retries
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def read_questions(
+    input_path: Path,
+    sheet_name: Optional[str],
+    start_row: int,
+    question_col_idx: int,
+    answer_col_idx: int,
+) -> Iterator[Tuple[int, str, Any]]:
+    """
+    Yield (row, question, existing answer) for every non-empty question, read
+    from a read-only workbook that is closed once the generator finishes.
+    """
+    # Only parse the column window spanning the question and answer cells
+    first_col = min(question_col_idx, answer_col_idx)
+    last_col = max(question_col_idx, answer_col_idx)
+    question_pos = question_col_idx - first_col + 1
+    answer_pos = answer_col_idx - first_col + 1
+    wb = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        rows = ws.iter_rows(
+            min_row=start_row, min_col=first_col, max_col=last_col, values_only=True
+        )
+        for row, values in enumerate(rows, start=start_row):
+            question = _value_at(values, question_pos)
+            if question is None:
+                continue  # Ignore empty question rows
+            # values_only already yields str for text cells; convert others once
+            question_text = (
+                question.strip() if isinstance(question, str) else str(question).strip()
             )
-            return "".join(chunks).strip(), latency
+            if not question_text:
+                continue
+
+            yield row, question_text, _value_at(values, answer_pos)
+    finally:
+        wb.close()
+
+
+def _take(rows: Iterator[Any], n: int) -> List[Any]:
+    """Pull up to n items from an iterator (runs on the reader thread)."""
+    return list(islice(rows, n))
+
+
+def load_checkpoint(path: Path) -> Dict[int, dict]:
+    """
+    Read a JSONL checkpoint into row -> latest record. A torn last line left by
+    a crash is ignored; a missing file means a fresh run.
+    """
+    records: Dict[int, dict] = {}
+    if not path.exists():
+        return records
+    with path.open("rb") as fp:
+        for line in fp:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            records[record["row"]] = record
+    return records
+
+
+def open_checkpoint(path: Path) -> BinaryIO:
+    """Open the checkpoint for appending, first terminating any torn last line."""
+    fp = path.open("ab")
+    if fp.tell() > 0:
+        with path.open("rb") as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b"\n":
+                fp.write(b"\n")
+    return fp
+
+
+def _append_record(fp: BinaryIO, record: dict) -> None:
+    """Persist one finished row immediately so it survives a crash or Ctrl+C."""
+    fp.write(orjson.dumps(record) + b"\n")
+    fp.flush()
+
+
+def _matches_record(
+    record: Optional[dict],
+    bot_id: str,
+    question_text: str,
+    temperature: Optional[float],
+) -> bool:
+    """
+    True if a checkpoint record answered this exact question with this bot at
+    this temperature, so a leftover checkpoint from another input, an edited
+    cell or different options never stands in for the current row.
+    """
+    return (
+        record is not None
+        and record.get("bot_id") == bot_id
+        and record.get("question") == question_text
+        and record.get("temperature") == temperature
+    )
 
 
-def process_workbook(
+def _record_values(record: dict) -> Tuple[Any, Any]:
+    """Map a checkpoint record to the (answer, latency) cell values."""
+    if "error" in record:
+        return f"[ERROR] {record['error']}", None
+    return record["answer"], record["latency"]
+
+
+async def _run_until_first_error(tasks: List["asyncio.Task[None]"]) -> None:
+    """
+    Wait for all tasks, but as soon as one fails cancel the rest and re-raise,
+    so e.g. an auth failure stops in one round trip instead of burning retries.
+    Finished rows are already flushed to the checkpoint at that point.
+    """
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    # Retrieve every exception (several workers may fail at once), raise the first
+    errors = [task.exception() for task in done if not task.cancelled()]
+    for error in errors:
+        if error is not None:
+            raise error
+
+
+def _value_at(values: Sequence[Any], col_idx: int) -> Any:
+    """Return the value at a 1-based position of a values_only row (None if short)."""
+    return values[col_idx - 1] if col_idx <= len(values) else None
+
+
+def _column_widths(ws_in: Any) -> List[Tuple[int, int, float]]:
+    """
+    Return the (min, max, width) custom column widths of a read-only sheet.
+    Read-only sheets do not expose `column_dimensions`, so the `<cols>` block
+    is parsed directly; parsing stops where the cell data begins.
+    """
+    widths = []
+    with ws_in._get_source() as src:  # pylint: disable=protected-access
+        for _, element in iterparse(src, events=("start",)):
+            if element.tag == f"{{{SHEET_MAIN_NS}}}sheetData":
+                break
+            if element.tag == f"{{{SHEET_MAIN_NS}}}col" and element.get("width"):
+                widths.append(
+                    (
+                        int(element.get("min")),
+                        int(element.get("max")),
+                        float(element.get("width")),
+                    )
+                )
+    return widths
+
+
+def _out_cell(ws_out: Any, value: Any, number_format: Optional[str] = None) -> Any:
+    """
+    Prepare one value for a write-only append. Text starting with "=" is
+    pinned to a string cell (append would otherwise store it as a formula),
+    and a non-default number format is carried over; anything else is passed
+    through as a plain value.
+    """
+    text_formula = isinstance(value, str) and value.startswith("=")
+    if not text_formula and number_format in (None, "General"):
+        return value
+    cell = WriteOnlyCell(ws_out, value)
+    if text_formula:
+        cell.data_type = "s"
+    if number_format:
+        cell.number_format = number_format
+    return cell
+
+
+def write_results(
+    input_path: Path,
+    output_path: Path,
+    sheet_name: Optional[str],
+    results: Dict[int, Tuple[Any, Any]],
+    answer_col_idx: int,
+    latency_col_idx: int,
+) -> None:
+    """
+    Copy every sheet of the input workbook into a write-only workbook, patching
+    the answer/latency columns of the processed sheet from `results`
+    (row -> values). Cell values, number formats and column widths survive;
+    other styles and merged cells are dropped.
+    """
+    width = max(answer_col_idx, latency_col_idx)
+    wb_in = load_workbook(input_path, read_only=True, data_only=True)
+    wb_out = Workbook(write_only=True)
+    try:
+        target = wb_in[sheet_name] if sheet_name else wb_in.active
+        for ws_in in wb_in.worksheets:
+            ws_out = wb_out.create_sheet(title=ws_in.title)
+            # Dimensions must be set before the first row is appended
+            for lo, hi, col_width in _column_widths(ws_in):
+                letter = get_column_letter(lo)
+                ws_out.column_dimensions[letter] = ColumnDimension(
+                    ws_out, index=letter, width=col_width, min=lo, max=hi
+                )
+            patch = ws_in.title == target.title
+            for row, cells in enumerate(ws_in.iter_rows(), start=1):
+                out = [_out_cell(ws_out, c.value, c.number_format) for c in cells]
+                if patch and row in results:
+                    if len(out) < width:
+                        out.extend([None] * (width - len(out)))
+                    answer, latency = results[row]
+                    out[answer_col_idx - 1] = _out_cell(ws_out, answer)
+                    out[latency_col_idx - 1] = latency
+                ws_out.append(out)
+        # Write-only workbooks default to the first sheet; open on the processed one
+        wb_out.active = wb_in.worksheets.index(target)
+    finally:
+        wb_in.close()
+    wb_out.save(output_path)
+
+
+async def process_workbook(
     client: AgentClient,
     input_path: Path,
     output_path: Path,
@@ -119,14 +613,16 @@ def process_workbook(
     retry_wait: float,
     temperature: Optional[float],
     latency_column: Optional[str],
+    concurrency: int,
+    dedupe: bool = False,
+    cache_db: Optional[Path] = None,
 ) -> dict:
     """
-    Iterate over the worksheet, send each question to the agent, write answers back,
-    store first-token latency metrics, and return counters summarizing the batch run.
+    Iterate over the worksheet, send questions to the agent concurrently (at most
+    `concurrency` in flight), write answers back, store first-token latency
+    metrics, and return counters summarizing the batch run. With `dedupe` (or a
+    `cache_db`), repeated questions reuse one answer instead of a new request.
     """
-    wb = load_workbook(input_path, data_only=True)
-    ws = wb[sheet_name] if sheet_name else wb.active
-
     question_col_idx = column_index_from_string(question_column.upper())
     answer_col_idx = column_index_from_string(answer_column.upper())
     if latency_column:
@@ -134,61 +630,161 @@ def process_workbook(
     else:
         latency_col_idx = answer_col_idx + 1  # 默认写入答案列的下一列
 
-    processed = skipped = failures = 0
-    max_row = ws.max_row
-
-    for row in range(start_row, max_row + 1):
-        cell = ws.cell(row=row, column=question_col_idx)
-        question = cell.value
-        if question is None or str(question).strip() == "":
-            continue  # Ignore empty question rows
-
-        question_text = str(question).strip()
-        answer_cell = ws.cell(row=row, column=answer_col_idx)
-
-        if skip_completed and answer_cell.value not in (None, ""):
-            skipped += 1
-            continue  # Respect existing answers
-
-        latency_cell = ws.cell(row=row, column=latency_col_idx)
-        success = False
-        last_error: Optional[Exception] = None
+    counts = {"processed": 0, "skipped": 0, "failed": 0, "resumed": 0}
+    # Every finished row is appended here as it completes, so a crash keeps
+    # the progress and a rerun of the same command only sends what is left
+    checkpoint_path = output_path.with_suffix(CHECKPOINT_SUFFIX)
+    completed = {
+        row: record
+        for row, record in load_checkpoint(checkpoint_path).items()
+        if "error" not in record
+    }
+    # Rows whose checkpoint record belongs to this run; any other record is
+    # stale and must not reach the output
+    current: Set[int] = set()
+    # Bounded so the sheet reader stalls instead of buffering when workers lag
+    queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(
+        maxsize=2 * concurrency
+    )
 
-        for attempt in range(1, max_retries + 1):
+    async def produce() -> None:
+        """
+        Move question batches from the reader thread into the work queue, so
+        XML parsing overlaps with requests that are already in flight. Ends by
+        queueing one end-of-input sentinel per worker.
+        """
+        loop = asyncio.get_running_loop()
+        rows = read_questions(
+            input_path, sheet_name, start_row, question_col_idx, answer_col_idx
+        )
+        # One dedicated thread: the read-only workbook is never touched concurrently
+        with ThreadPoolExecutor(max_workers=1) as reader:
             try:
-                answer, latency = client.complete(question_text, temperature)
-                answer_cell.value = answer
-                latency_cell.value = (
-                    round(latency, 3) if latency is not None else None
+                while True:
+                    batch = await loop.run_in_executor(
+                        reader, _take, rows, concurrency
+                    )
+                    if not batch:
+                        break
+                    for row, question_text, existing_answer in batch:
+                        if _matches_record(
+                            completed.get(row),
+                            client.bot_id,
+                            question_text,
+                            temperature,
+                        ):
+                            counts["resumed"] += 1
+                            current.add(row)
+                            continue  # Answered by an interrupted earlier run
+                        if skip_completed and existing_answer not in (None, ""):
+                            counts["skipped"] += 1
+                            continue  # Respect existing answers
+                        current.add(row)
+                        await queue.put((row, question_text))
+            finally:
+                await loop.run_in_executor(reader, rows.close)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work(session: httpx.AsyncClient, checkpoint: BinaryIO) -> None:
+        """Drain the queue until the end-of-input sentinel arrives."""
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            row, question_text = job
+
+            def fetch() -> Awaitable[Tuple[str, Optional[float]]]:
+                return complete_with_retries(
+                    client,
+                    session,
+                    row,
+                    question_text,
+                    temperature,
+                    max_retries,
+                    retry_wait,
                 )
-                processed += 1
-                success = True
-                print(f"[OK] Row {row} processed.")
-                time.sleep(request_interval)  # Rate-limit between calls
-                break
+
+            try:
+                if cache is None:
+                    (answer, latency), reused = await fetch(), False
+                else:
+                    (answer, latency), reused = await cache.get_or_fetch(
+                        question_text, fetch
+                    )
+            except PermanentAgentError:
+                raise  # Not a row failure: abort the run, row stays unanswered
             except Exception as exc:  # pylint: disable=broad-except
-                last_error = exc
-                print(
-                    f"[WARN] Row {row} attempt {attempt} failed: {exc}",
-                    file=sys.stderr,
+                counts["failed"] += 1
+                _append_record(
+                    checkpoint,
+                    {
+                        "row": row,
+                        "bot_id": client.bot_id,
+                        "question": question_text,
+                        "temperature": temperature,
+                        "error": str(exc),
+                    },
                 )
-                if attempt < max_retries:
-                    time.sleep(retry_wait)  # Back off before retrying
-
-        if not success:
-            failures += 1
-            answer_cell.value = f"[ERROR] {last_error}"
-            latency_cell.value = None
-
+                continue
+
+            _append_record(
+                checkpoint,
+                {
+                    "row": row,
+                    "bot_id": client.bot_id,
+                    "question": question_text,
+                    "temperature": temperature,
+                    "answer": answer,
+                    "latency": round(latency, 3) if latency is not None else None,
+                },
+            )
+            counts["processed"] += 1
+            if reused:
+                print(f"[OK] Row {row} processed (reused answer).")
+                continue
+            print(f"[OK] Row {row} processed.")
+            if request_interval > 0:
+                await asyncio.sleep(request_interval)  # Rate-limit this worker
+
+    # Phase 1: a reader thread streams questions from the read-only workbook
+    # while a fixed pool of workers answers them
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(output_path)
-
-    return {
-        "processed": processed,
-        "skipped": skipped,
-        "failed": failures,
-        "output": str(output_path),
+    cache = (
+        AnswerCache(client.bot_id, temperature, cache_db)
+        if dedupe or cache_db is not None
+        else None
+    )
+    try:
+        with open_checkpoint(checkpoint_path) as checkpoint:
+            async with client.new_async_session(concurrency) as session:
+                tasks = [asyncio.create_task(produce())] + [
+                    asyncio.create_task(work(session, checkpoint))
+                    for _ in range(concurrency)
+                ]
+                await _run_until_first_error(tasks)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    # Phase 2: stream every row back out through a write-only workbook, taking
+    # answers from the checkpoint; it is only removed once the save succeeded
+    results = {
+        row: _record_values(record)
+        for row, record in load_checkpoint(checkpoint_path).items()
+        if row in current
     }
+    write_results(
+        input_path,
+        output_path,
+        sheet_name,
+        results,
+        answer_col_idx,
+        latency_col_idx,
+    )
+    checkpoint_path.unlink()
+
+    return {**counts, "output": str(output_path)}
 
 
 def parse_args() -> argparse.Namespace:
@@ -219,6 +815,12 @@ def parse_args() -> argparse.Namespace:
         default=0.2,
         help="每次调用后的等待秒数，默认 0.2",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="同时进行的请求数，默认 1；大于 1 时首帧耗时会受并发争用影响而偏大",
+    )
     parser.add_argument(
         "--max-retries", type=int, default=3, help="失败重试次数，默认 3 次"
     )
@@ -234,12 +836,24 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--timeout", type=int, default=60, help="HTTP 超时时间，默认 60 秒"
     )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="相同问题只请求一次，其余行复用该答案与首帧耗时",
+    )
+    parser.add_argument(
+        "--cache-db",
+        help="SQLite 答案缓存文件，跨多次运行复用答案（隐含 --dedupe）",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     """Entry point: parse CLI args, run the batch, summarize results."""
     args = parse_args()
+    if uvloop is not None:
+        # Cheaper per-frame scheduling when many SSE streams are in flight
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
     input_path = Path(args.input).expanduser().resolve()
     if not input_path.exists():
@@ -254,22 +868,36 @@ def main() -> None:
 
     client = AgentClient(args.bot_id, args.api_key, timeout=args.timeout)
 
-    stats = process_workbook(
-        client=client,
-        input_path=input_path,
-        output_path=output_path,
-        sheet_name=args.sheet_name,
-        question_column=args.question_column,
-        answer_column=args.answer_column,
-        start_row=args.start_row,
-        skip_completed=args.skip_completed,
-        request_interval=args.request_interval,
-        max_retries=max(1, args.max_retries),
-        retry_wait=args.retry_wait,
-        temperature=args.temperature,
-        latency_column=args.latency_column,
-    )
-
+    try:
+        stats = asyncio.run(
+            process_workbook(
+                client=client,
+                input_path=input_path,
+                output_path=output_path,
+                sheet_name=args.sheet_name,
+                question_column=args.question_column,
+                answer_column=args.answer_column,
+                start_row=args.start_row,
+                skip_completed=args.skip_completed,
+                request_interval=args.request_interval,
+                max_retries=max(1, args.max_retries),
+                retry_wait=args.retry_wait,
+                temperature=args.temperature,
+                latency_column=args.latency_column,
+                concurrency=max(1, args.concurrency),
+                dedupe=args.dedupe,
+                cache_db=Path(args.cache_db).expanduser() if args.cache_db else None,
+            )
+        )
+    except PermanentAgentError as exc:
+        checkpoint_path = output_path.with_suffix(CHECKPOINT_SUFFIX)
+        raise SystemExit(
+            f"已中止：{exc}。已完成的行保存在 {checkpoint_path}，"
+            "修正 API Key/权限后重跑相同命令即可续跑"
+        ) from exc
+
+    if stats["resumed"]:
+        print(f"续跑：沿用上次中断前已完成的 {stats['resumed']} 条")
     print(
         f"完成：{stats['processed']} 条，跳过：{stats['skipped']} 条，失败：{stats['failed']} 条，结果写入 {stats['output']}"
     )
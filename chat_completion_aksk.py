@@ -3,11 +3,13 @@ import argparse
 import datetime
 import hashlib
 import hmac
-import json
 from urllib.parse import quote
 
+import orjson
 import requests
 
+from sse_stream import SSEStreamError, iter_sse_deltas, read_blocks
+
 Service = "volc_torchlight_api"
 Action = "ChatCompletion"
 Version = "2024-01-01"
@@ -15,6 +17,18 @@ Region = "cn-north-1"
 Host = "mercury.volcengineapi.com"
 ContentType = "application/json"
 
+# 复用同一个 Session，使多次签名请求共享 TCP/TLS 连接
+_SESSION = requests.Session()
+# 参与签名的请求头固定不变，规范请求串只需填入动态字段（日期、请求体哈希等）
+_SIGNED_HEADERS = "content-type;host;x-content-sha256;x-date"
+_CANONICAL_REQUEST_FMT = (
+    "{method}\n{path}\n{query}\n"
+    "content-type:{content_type}\nhost:{host}\nx-content-sha256:{sha}\nx-date:{date}\n"
+    "\n" + _SIGNED_HEADERS + "\n{sha}"
+)
+# 派生出的签名密钥只随日期变化，按 (sk, 日期, region, service) 缓存
+_SIGNING_KEY_CACHE = {}
+
 
 def norm_query(params):
     query = ""
@@ -30,6 +44,10 @@ def norm_query(params):
     return query.replace("+", "%20")
 
 
+# Action/Version 固定不变，规范化后的查询串在导入时算好，签名与发送都直接复用
+_NORM_QUERY = norm_query({"Action": Action, "Version": Version})
+
+
 # 第一步：准备辅助函数。
 # sha256 非对称加密
 def hmac_sha256(key: bytes, content: str):
@@ -41,6 +59,19 @@ def hash_sha256(content: str):
     return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
 
+# 派生签名密钥：k_date -> k_region -> k_service -> k_signing，同一天内直接复用缓存
+def get_signing_key(sk: str, date: str, region: str, service: str) -> bytes:
+    key = (sk, date, region, service)
+    k_signing = _SIGNING_KEY_CACHE.get(key)
+    if k_signing is None:
+        k_date = hmac_sha256(sk.encode("utf-8"), date)
+        k_region = hmac_sha256(k_date, region)
+        k_service = hmac_sha256(k_region, service)
+        k_signing = hmac_sha256(k_service, "request")
+        _SIGNING_KEY_CACHE[key] = k_signing
+    return k_signing
+
+
 # 第二步：签名请求函数
 def request(method, body, ak, sk):
     # 第三步：创建身份证明。其中的 Service 和 Region 字段是固定的。ak 和 sk 分别代表
@@ -69,7 +100,9 @@ def request(method, body, ak, sk):
     # 初始化签名结果的结构体
     x_date = request_param["date"].strftime("%Y%m%dT%H%M%SZ")
     short_x_date = x_date[:8]
-    x_content_sha256 = hash_sha256(json.dumps(request_param["body"]))
+    # 签名与发送使用同一份序列化结果，保证 X-Content-Sha256 与实际请求体一致
+    body_bytes = orjson.dumps(request_param["body"])
+    x_content_sha256 = hashlib.sha256(body_bytes).hexdigest()
     sign_result = {
         "Host": request_param["host"],
         "X-Content-Sha256": x_content_sha256,
@@ -77,25 +110,14 @@ def request(method, body, ak, sk):
         "Content-Type": request_param["content_type"],
     }
     # 第五步：计算 Signature 签名。
-    signed_headers_str = ";".join(
-        ["content-type", "host", "x-content-sha256", "x-date"]
-    )
-    canonical_request_str = "\n".join(
-        [request_param["method"].upper(),
-         request_param["path"],
-         norm_query(request_param["query"]),
-         "\n".join(
-             [
-                 "content-type:" + request_param["content_type"],
-                 "host:" + request_param["host"],
-                 "x-content-sha256:" + x_content_sha256,
-                 "x-date:" + x_date,
-                 ]
-         ),
-         "",
-         signed_headers_str,
-         x_content_sha256,
-         ]
+    canonical_request_str = _CANONICAL_REQUEST_FMT.format(
+        method=request_param["method"].upper(),
+        path=request_param["path"],
+        query=_NORM_QUERY,
+        content_type=request_param["content_type"],
+        host=request_param["host"],
+        sha=x_content_sha256,
+        date=x_date,
     )
 
     hashed_canonical_request = hash_sha256(canonical_request_str)
@@ -103,40 +125,34 @@ def request(method, body, ak, sk):
     credential_scope = "/".join([short_x_date, credential["region"], credential["service"], "request"])
     string_to_sign = "\n".join(["HMAC-SHA256", x_date, credential_scope, hashed_canonical_request])
 
-    k_date = hmac_sha256(credential["secret_access_key"].encode("utf-8"), short_x_date)
-    k_region = hmac_sha256(k_date, credential["region"])
-    k_service = hmac_sha256(k_region, credential["service"])
-    k_signing = hmac_sha256(k_service, "request")
+    k_signing = get_signing_key(
+        credential["secret_access_key"], short_x_date, credential["region"], credential["service"]
+    )
     signature = hmac_sha256(k_signing, string_to_sign).hex()
 
     sign_result["Authorization"] = "HMAC-SHA256 Credential={}, SignedHeaders={}, Signature={}".format(
         credential["access_key_id"] + "/" + credential_scope,
-        signed_headers_str,
+        _SIGNED_HEADERS,
         signature,
         )
     header = {**sign_result}
     # 第六步：将 Signature 签名写入 HTTP Header 中，并发送 HTTP 请求。
-    r = requests.request(method=method,
-                         url="https://{}{}".format(request_param["host"], request_param["path"]),
+    r = _SESSION.request(method=method,
+                         url="https://{}{}?{}".format(request_param["host"], request_param["path"], _NORM_QUERY),
                          headers=header,
-                         params=request_param["query"],
-                         json=request_param["body"], stream=True
+                         data=body_bytes, stream=True
                          )
     if r.status_code == 200:
-        stream_resp = []
         total_content = ""
-        for line in r.iter_lines():
-            if line:
-                line_str = line.decode('utf - 8')
-                if "invalid_request" in line_str:
-                    print(f"请求错误，状态码: {r.status_code}， 报错：{r.text}")
-                elif line_str.startswith("data:"):
-                    stream_resp.append(line_str)
-                    # 流式帧
-                    print(line_str)
-                    data = line_str[len("data:"):].strip()
-                    if data not in ["[DONE]", "done"]:
-                        total_content += json.loads(data)["choices"][0]["delta"]["content"]
+        # 分行、前缀匹配与 JSON 解析由共用的 sse_stream 一次完成，逐个产出增量文本
+        try:
+            for delta in iter_sse_deltas(read_blocks(r.raw)):
+                # 流式帧
+                print(delta, end="", flush=True)
+                total_content += delta
+            print()
+        except SSEStreamError as e:
+            print(f"请求错误，状态码: {r.status_code}， 报错：{e}")
 
         print(f"流式回复内容：\n{total_content}")
     else:
@@ -11,10 +11,11 @@
 """
 
 import argparse  # 解析命令行参数
-import json      # 解析服务端返回的 JSON 数据
 
 import requests  # 进行 HTTP 请求
 
+from sse_stream import SSEStreamError, iter_sse_deltas, read_blocks  # 共用的 SSE 流解析
+
 # 目标服务的主机与路径（按服务端文档配置）
 Host = "open.feedcoopapi.com"
 Path = "/agent_api/agent/chat/completion"
@@ -51,44 +52,18 @@ def request(method, body, api_key):
 
     # 响应码 200 视为成功，其它打印错误信息后返回
     if r.status_code == 200:
-        stream_resp = []     # 保存原始的流式行（可用于调试）
         total_content = ""   # 累计模型增量内容，最终形成完整回复
 
-        # iter_lines() 可逐行迭代响应体，常用于处理 SSE 或分块传输
-        for line in r.iter_lines():
-            if not line:
-                continue  # 跳过空行（SSE 心跳/分隔）
-
-            # 修正解码：必须为 'utf-8'，否则可能报错
-            line_str = line.decode('utf-8')
-
-            # 如果服务端以纯文本告知请求非法，可在此拦截并提示。
-            if "invalid_request" in line_str:
-                print(f"请求错误，状态码: {r.status_code}，报错：{r.text}")
-                continue
-
-            # SSE 规范常以 "data:" 开头承载一帧数据。
-            if line_str.startswith("data:"):
-                stream_resp.append(line_str)  # 记录原始行，便于排查问题
-
-                # 打印原始流帧，直观查看增量（可按需关闭）
-                print(line_str)
-
-                # 去掉前缀并裁剪空白，得到 JSON 字符串或特殊标记
-                data = line_str[len("data:"):].strip()
-
-                # 流结束标记，常见为 [DONE] 或 done
-                if data in ["[DONE]", "done"]:
-                    continue
-
-                # 解析 JSON 数据结构，累加增量内容片段
-                try:
-                    payload = json.loads(data)
-                    delta = payload["choices"][0]["delta"].get("content", "")
-                    total_content += delta
-                except Exception as e:
-                    # 若某帧不是预期 JSON 结构，打印以便定位
-                    print(f"解析流数据失败：{e}，原始数据：{data}")
+        # iter_sse_deltas() 负责分行、匹配 "data:" 前缀、识别 [DONE] 结束标记并解析 JSON，
+        # 逐个产出增量文本；这里边收边打印，直观查看流式效果。
+        try:
+            for delta in iter_sse_deltas(read_blocks(r.raw)):
+                print(delta, end="", flush=True)
+                total_content += delta
+            print()
+        except SSEStreamError as e:
+            # 服务端以纯文本告知请求非法（如 invalid_request）时在此提示
+            print(f"请求错误，状态码: {r.status_code}，报错：{e}")
 
         # 输出最终汇总的完整回复内容
         print(f"流式回复内容：\n{total_content}")
@@ -0,0 +1,98 @@
+"""
+Shared Server-Sent Events parsing for the agent chat-completion streams.
+
+Line framing, the `data:` prefix match and the JSON decode all happen in one
+pass over raw body bytes; only the content deltas are handed back as `str`.
+"""
+
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+import orjson
+
+SSE_READ_SIZE = 64 * 1024  # Max bytes pulled from the socket per read
+
+
+class SSEStreamError(RuntimeError):
+    """Raised when the stream carries a plain-text error instead of SSE data."""
+
+
+class SSEDecoder:
+    """
+    Incremental decoder: feed it body blocks as they arrive and it returns the
+    content deltas of every complete `data:` line. `done` flips once the
+    `[DONE]` marker has been seen.
+    """
+
+    def __init__(self) -> None:
+        self._buf = b""
+        self.done = False
+
+    def feed(self, block: bytes) -> List[str]:
+        """Decode all complete lines in `block`, keeping the partial tail."""
+        *lines, self._buf = (self._buf + block).split(b"\n")
+        return self._parse(lines)
+
+    def close(self) -> List[str]:
+        """Decode whatever is left once the body has ended."""
+        lines, self._buf = [self._buf], b""
+        return self._parse(lines)
+
+    def _parse(self, lines: List[bytes]) -> List[str]:
+        deltas = []
+        for line in lines:
+            if self.done:
+                break
+            line = line.strip()
+            # Non-streaming errors surface as plain text rather than SSE data
+            if not line.startswith(b"data:"):
+                if b"invalid_request" in line:
+                    raise SSEStreamError(line.decode("utf-8", errors="ignore"))
+                continue
+
+            data = line[len(b"data:") :].strip()
+            if data in (b"[DONE]", b"done"):
+                self.done = True
+                break
+            try:
+                payload = orjson.loads(data)
+                content = payload["choices"][0].get("delta", {}).get("content")
+            except (orjson.JSONDecodeError, LookupError, TypeError, AttributeError):
+                continue  # Ignore malformed SSE payloads
+            if content:
+                deltas.append(content)
+        return deltas
+
+
+def read_blocks(raw, size: int = SSE_READ_SIZE) -> Iterator[bytes]:
+    """
+    Yield decompressed body blocks from a urllib3 response (`requests`'
+    `resp.raw`), returning as soon as any bytes are available rather than
+    waiting for `size` bytes.
+    """
+    while True:
+        block = raw.read1(size, decode_content=True)
+        if not block:
+            return
+        yield block
+
+
+def iter_sse_deltas(blocks: Iterable[bytes]) -> Iterator[str]:
+    """Yield content deltas from an iterable of raw SSE body blocks."""
+    decoder = SSEDecoder()
+    for block in blocks:
+        yield from decoder.feed(block)
+        if decoder.done:
+            return
+    yield from decoder.close()
+
+
+async def aiter_sse_deltas(blocks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Async twin of `iter_sse_deltas`, e.g. over httpx's `resp.aiter_bytes()`."""
+    decoder = SSEDecoder()
+    async for block in blocks:
+        for delta in decoder.feed(block):
+            yield delta
+        if decoder.done:
+            return
+    for delta in decoder.close():
+        yield delta